@@ -0,0 +1,130 @@
+# doc_table.py
+# LangChain Document 리스트(AoS) -> 컬럼 배열(SoA) 변환.
+# 스코어링 루프가 doc.metadata dict를 반복 조회하지 않게 한 번만 파싱해둔다.
+import re
+import sys
+from collections import namedtuple
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+# Document 대신 경계 밖으로 넘기는 가벼운 행 표현 (pickle/캐시용으로도 쌈)
+DocRow = namedtuple("DocRow", "text views level cook_time method situation menu title")
+
+# level 문자열 -> 작은 정수 코드 (0=기타, 1=쉬움, 2=중급)
+LEVEL_EASY = 1
+LEVEL_MID = 2
+LEVEL_CODE = {
+    "초급": LEVEL_EASY,
+    "아무나": LEVEL_EASY,
+    "쉬움": LEVEL_EASY,
+    "Easy": LEVEL_EASY,
+    "중급": LEVEL_MID,
+}
+
+_TIME_RE = re.compile(r"(\d+)\s*분")
+
+
+def parse_minutes(time_str) -> int:
+    """'30분이내' -> 30, '정보 없음'/빈값 -> 9999"""
+    if not time_str:
+        return 9999
+    t = str(time_str).strip()
+    if "정보" in t:
+        return 9999
+    m = _TIME_RE.search(t)
+    if m:
+        return int(m.group(1))
+    return 9999
+
+
+def score_kernel(F: np.ndarray, w) -> np.ndarray:
+    """공용 선형 스코어 커널.
+
+    F: (N, 5) = [양(+) 피처 4개, 시간 페널티], w: (5,) 또는 (5, M).
+    반환: (N,) 또는 (N, M) 점수.
+    """
+    # 커널은 F의 dtype을 따라감 (float32 F면 float32 SIMD 경로)
+    w = np.asarray(w, dtype=F.dtype)
+    return F[:, :4] @ w[:4] - np.multiply.outer(F[:, 4], w[4])
+
+
+def time_code_from_minutes(m: int) -> int:
+    """분 -> 시간 버킷 코드: 0(<=30) / 1(<=60) / 2(그 외)"""
+    return 0 if m <= 30 else (1 if m <= 60 else 2)
+
+
+@dataclass
+class DocTable:
+    texts: List[str]
+    views: np.ndarray       # int64
+    level_code: np.ndarray  # int8, LEVEL_CODE 값
+    time_code: np.ndarray   # int8, 0(<=30분) / 1(<=60분) / 2(그 외)
+    minutes: np.ndarray     # int32, 파싱된 조리시간(분)
+    levels: List[str]
+    methods: List[str]
+    situations: List[str]
+    menus: List[str]
+    titles: List[str]
+    times: List[str]    # 원본 조리시간 문자열 (태그 표시용)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def row(self, i: int) -> DocRow:
+        return DocRow(
+            text=self.texts[i],
+            views=int(self.views[i]),
+            level=self.levels[i],
+            cook_time=int(self.minutes[i]),
+            method=self.methods[i],
+            situation=self.situations[i],
+            menu=self.menus[i],
+            title=self.titles[i],
+        )
+
+    def rows(self):
+        return [self.row(i) for i in range(len(self))]
+
+    @classmethod
+    def from_docs(cls, docs):
+        n = len(docs)
+        texts, levels, methods, situations = [], [], [], []
+        menus, titles, times = [], [], []
+        views = np.zeros(n, dtype=np.int64)
+        level_code = np.zeros(n, dtype=np.int8)
+        time_code = np.zeros(n, dtype=np.int8)
+        minutes = np.zeros(n, dtype=np.int32)
+
+        for i, doc in enumerate(docs):
+            md = doc.metadata or {}
+            texts.append(doc.page_content or "")
+            # intern: 같은 카테고리 문자열이 반복되므로 == 비교가 identity로 끝남
+            level = sys.intern(str(md.get("level", "")).strip())
+            levels.append(level)
+            methods.append(sys.intern(str(md.get("method", ""))))
+            situations.append(sys.intern(str(md.get("situation", ""))))
+            menus.append(str(md.get("menu", "")))
+            titles.append(str(md.get("title", "")))
+            times.append(sys.intern(str(md.get("time", ""))))
+
+            views[i] = int(md.get("views", 0) or 0)
+            level_code[i] = LEVEL_CODE.get(level, 0)
+            m = parse_minutes(md.get("time", ""))
+            minutes[i] = min(m, np.iinfo(np.int32).max)
+            time_code[i] = time_code_from_minutes(m)
+
+        return cls(
+            texts=texts,
+            views=views,
+            level_code=level_code,
+            time_code=time_code,
+            minutes=minutes,
+            levels=levels,
+            methods=methods,
+            situations=situations,
+            menus=menus,
+            titles=titles,
+            times=times,
+        )
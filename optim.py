@@ -1,26 +1,185 @@
+import hashlib
+import math
+import os
+import re
+import zipfile
+
 import numpy as np
 from scipy.optimize import differential_evolution
-from retriever import retriever
+from doc_table import DocTable, LEVEL_EASY, parse_minutes, score_kernel, time_code_from_minutes
+from retriever import retrieve
+
+LEVEL_LUT = {"초급": 1.0, "아무나": 1.0, "쉬움": 1.0, "Easy": 1.0, "중급": 0.5}
+
+# level_code(0/1/2) -> level_score
+_LEVEL_SCORE = np.array([0.0, 1.0, 0.5])
+
+# numba is optional: with it the string-feature loop runs compiled,
+# without it we fall back to the regex path below
+try:
+    from numba import njit
+    from numba.typed import List as TypedList
+except ImportError:
+    njit = None
+
+# below this many docs the JIT warm-up costs more than it saves
+_JIT_MIN_DOCS = 200
+
+# precomputed features are deterministic in (corpus, ings, style) -> disk cache
+_FEATURE_CACHE_DIR = "cache"
+_FEATURE_KEYS = ("F", "views", "ing_hits", "style_score", "level_mask", "gain")
+
+# frontier orientation: larger-is-better, so the penalty column flips sign
+_FRONT_SIGN = np.array([1.0, 1.0, 1.0, 1.0, -1.0])
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _extract_string_features(texts, ings, style_hint, methods, situations):
+        n = len(texts)
+        ing_hits = np.zeros(n, dtype=np.int32)
+        style_score = np.zeros(n)
+        for i in range(n):
+            text = texts[i]
+            hits = 0
+            for ing in ings:
+                if ing in text:
+                    hits += 1
+            ing_hits[i] = hits
+            if len(style_hint) > 0 and (
+                style_hint in text
+                or style_hint in methods[i]
+                or style_hint in situations[i]
+            ):
+                style_score[i] = 1.0
+        return ing_hits, style_score
+
+
+def _dominated_by_counts(feats):
+    """feats: (N, D) oriented so larger is better. Returns, per doc, how
+    many other docs dominate it (>= in every feature, > in at least one)."""
+    ge = (feats[None, :, :] >= feats[:, None, :]).all(-1)  # ge[i, j]: j >= i everywhere
+    gt = (feats[None, :, :] > feats[:, None, :]).any(-1)   # gt[i, j]: j > i somewhere
+    return (ge & gt).sum(axis=1)
 
 
 class AutoRanker:
     def __init__(self):
         # [w_ing, w_level, w_pop, w_style, p_time]
         self.params = np.array([2.0, 1.0, 0.5, 1.0, 1.0])
-
-    def _level_score(self, level):
-        if level in ["초급", "아무나", "쉬움", "Easy"]:
-            return 1
-        if level == "중급":
-            return 0.5
-        return 0
-
-    def _parse_time(self, t):
-        if "30" in str(t):
-            return 0
-        if "60" in str(t):
-            return 1
-        return 2
+        # filled by _precompute; stays None on a feature-cache hit
+        self._ing_mask = None
+
+    # ------------------ feature cache ------------------
+
+    def _feature_cache_path(self, docs, user_ings, style_hint):
+        if isinstance(docs, DocTable):
+            return None
+        menus = "|".join(sorted(str((d.metadata or {}).get("menu", "")) for d in docs))
+        corpus_key = hashlib.blake2b(menus.encode(), digest_size=16).hexdigest()
+        user = "|".join(sorted(i.strip() for i in user_ings)) + "::" + (style_hint or "")
+        user_key = hashlib.blake2b(user.encode(), digest_size=16).hexdigest()
+        return os.path.join(_FEATURE_CACHE_DIR, f"feat_{corpus_key}_{user_key}.npz")
+
+    def _load_features(self, path):
+        if path is None or not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                for key in _FEATURE_KEYS:
+                    setattr(self, f"_{key}", data[key])
+            return True
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            # a run killed mid-save can leave a broken archive; recompute
+            return False
+
+    def _save_features(self, path):
+        if path is None:
+            return
+        tmp = path + ".tmp"
+        try:
+            os.makedirs(_FEATURE_CACHE_DIR, exist_ok=True)
+            # temp file + atomic rename: a partial save is never observable
+            with open(tmp, "wb") as f:
+                np.savez(f, **{key: getattr(self, f"_{key}") for key in _FEATURE_KEYS})
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            # cache is best-effort
+
+    # ------------------ precompute ------------------
+
+    def _precompute(self, docs, user_ings, style_hint):
+        """Extract the five score features once; they are constant across
+        the DE search (only the weights change)."""
+        table = docs if isinstance(docs, DocTable) else DocTable.from_docs(docs)
+        n = len(table)
+        texts = table.texts
+        methods = table.methods
+        situations = table.situations
+
+        level_score = _LEVEL_SCORE[table.level_code]
+        level_mask = (table.level_code == LEVEL_EASY).astype(np.float64)
+        time_pen = table.time_code.astype(np.int64)
+        views = table.views
+
+        ings = sorted({i.strip() for i in user_ings if i.strip()}, key=len, reverse=True)
+        self._ing_mask = None  # per-doc ingredient bitmasks (regex path only)
+
+        if njit is not None and n >= _JIT_MIN_DOCS and ings:
+            ing_hits, style_score = _extract_string_features(
+                TypedList(texts),
+                TypedList(ings),
+                style_hint or "",
+                TypedList(methods),
+                TypedList(situations),
+            )
+        else:
+            # regex alternation as a cheap prefilter: one scan rules out docs
+            # with no hit at all. Bits are set with per-needle 'in' tests so
+            # needles that contain each other (파/양파, 고추/고추장) all count,
+            # matching the Numba path and the original semantics.
+            ing_re = re.compile("|".join(map(re.escape, ings))) if ings else None
+            masks = [0] * n
+            ing_hits = np.zeros(n, dtype=np.int32)
+            style_score = np.zeros(n)
+            for i, text in enumerate(texts):
+                if ing_re is not None and ing_re.search(text) is not None:
+                    # which ingredients hit, as a bitmask; popcount = distinct hits
+                    mask = 0
+                    for j, ing in enumerate(ings):
+                        if ing in text:
+                            mask |= 1 << j
+                    masks[i] = mask
+                    ing_hits[i] = mask.bit_count()
+                style_score[i] = 1 if style_hint and (
+                    style_hint in text
+                    or style_hint in methods[i]
+                    or style_hint in situations[i]
+                ) else 0
+            self._ing_mask = masks
+
+        pop_score = np.log1p(views.astype(np.float64))
+
+        # (N, 5): four positively-weighted features plus the time penalty.
+        # float32 is plenty - only the induced ordering matters - and halves
+        # the bandwidth of the (N, M) score matrices under vectorized DE.
+        self._F = np.column_stack(
+            [ing_hits, level_score, pop_score, style_score, time_pen]
+        ).astype(np.float32)
+        self._views = views
+        self._ing_hits = ing_hits.astype(np.float64)
+        self._style_score = style_score
+        self._level_mask = level_mask
+
+        # the objective's four top-5 means are linear, so they fold into one
+        # per-doc gain: mean(gain[top]) == views.mean + 2000*ing.mean + ...
+        self._gain = (
+            views + 2000.0 * self._ing_hits + 1000.0 * style_score + 500.0 * level_mask
+        ).astype(np.float32)
 
     # ------------------ scoring ------------------
 
@@ -29,16 +188,17 @@ class AutoRanker:
         text = doc.page_content or ""
 
         ing_hit = sum(1 for ing in user_ings if ing.strip() in text)
-        level_score = self._level_score(md.get("level", ""))
-        pop_score = np.log1p(int(md.get("views", 0)))
+        level_score = LEVEL_LUT.get(str(md.get("level", "")).strip(), 0.0)
+        # scalar path: math.log1p avoids the NumPy scalar-call overhead
+        pop_score = math.log1p(int(md.get("views", 0)))
 
         style_score = 1 if style_hint and (
             style_hint in text
-            or style_hint in str(md.get("method", ""))
-            or style_hint in str(md.get("situation", ""))
+            or style_hint in (md.get("method") or "")
+            or style_hint in (md.get("situation") or "")
         ) else 0
 
-        time_pen = self._parse_time(md.get("time", ""))
+        time_pen = time_code_from_minutes(parse_minutes(md.get("time", "")))
 
         w_ing, w_level, w_pop, w_style, p_time = self.params
 
@@ -50,67 +210,95 @@ class AutoRanker:
             - p_time * time_pen
         )
 
+    def score_docs(self, docs, user_ings, style_hint):
+        """Batch version of score: one feature pass, one ufunc per column."""
+        self._precompute(docs, user_ings, style_hint)
+        return score_kernel(self._F, self.params)
+
     # ------------------ objective ------------------
 
-    def _objective(self, params, docs, user_ings, style_hint):
-        self.params = params
+    def _objective(self, params):
+        """Accepts a single candidate (5,) or, under vectorized DE, the
+        whole population as (5, M); returns a scalar or (M,) of
+        negative final scores."""
+        params = np.asarray(params)
+        scores = score_kernel(self._F, params)
 
-        ranked = sorted(
-            docs, key=lambda d: self.score(d, user_ings, style_hint), reverse=True
-        )
-        top = ranked[:5]
+        if params.ndim == 1:
+            if len(scores) > 5:
+                top = np.argpartition(-scores, 5)[:5]
+            else:
+                top = np.arange(len(scores))
 
-        views = np.mean([int(d.metadata.get("views", 0)) for d in top])
+            return -self._gain[top].mean()
 
-        ing_match = np.mean(
-            [sum(1 for ing in user_ings if ing in (d.page_content or "")) for d in top]
-        )
+        # (N, M): one score column per population member
+        if scores.shape[0] > 5:
+            top = np.argpartition(-scores, 5, axis=0)[:5]  # (5, M)
+        else:
+            top = np.tile(np.arange(scores.shape[0])[:, None], (1, scores.shape[1]))
 
-        style_match = np.mean(
-            [
-                1
-                if style_hint
-                and (
-                    style_hint in (d.page_content or "")
-                    or style_hint in str(d.metadata.get("situation", ""))
-                    or style_hint in str(d.metadata.get("method", ""))
-                )
-                else 0
-                for d in top
-            ]
-        )
-
-        level_match = np.mean(
-            [
-                1
-                if d.metadata.get("level") in ["초급", "아무나", "쉬움", "Easy"]
-                else 0
-                for d in top
-            ]
-        )
-
-        final_score = (
-            views
-            + 2000 * ing_match
-            + 1000 * style_match
-            + 500 * level_match
-        )
-
-        return -final_score
+        return -self._gain[top].mean(axis=0)
 
     # ------------------ training ------------------
 
-    def fit(self, docs, user_ings, style_hint):
+    def _expand_params(self, p):
+        # (k,) or (k, M) active params -> full (5,)/(5, M), inactive dims 0
+        p = np.asarray(p)
+        full = np.zeros((5,) + p.shape[1:])
+        full[self._active] = p
+        return full
+
+    def _objective_active(self, params):
+        return self._objective(self._expand_params(params))
+
+    def fit(self, docs, user_ings, style_hint, workers=1):
+        cache_path = self._feature_cache_path(docs, user_ings, style_hint)
+        if not self._load_features(cache_path):
+            self._precompute(docs, user_ings, style_hint)
+            self._save_features(cache_path)
+
+        # <=5 docs: every weight choice yields the same top-5
+        if len(self._gain) <= 5:
+            return self.params
+
+        # a doc dominated by >=5 others can never be needed in a top-5:
+        # for any w >= 0 each dominator scores at least as high and carries
+        # at least as much gain, so dropping it leaves the objective intact
+        # (Pareto-frontier-only pruning is wrong - dominated docs still
+        # legitimately fill slots 2-5)
+        keep = _dominated_by_counts(self._F * _FRONT_SIGN) < 5
+        if keep.sum() < len(keep):
+            self._F = self._F[keep]
+            self._gain = self._gain[keep]
+
         bounds = [(0, 5), (0, 5), (0, 2), (0, 3), (0, 3)]
 
-        result = differential_evolution(
-            self._objective,
-            bounds=bounds,
-            args=(docs, user_ings, style_hint),
+        # a feature that is constant across docs cannot change the ranking,
+        # so its weight is unidentifiable - drop it from the search
+        self._active = np.ptp(self._F, axis=0) > 0
+        if not self._active.any():
+            return self.params
+
+        de_kwargs = dict(
+            bounds=[b for b, a in zip(bounds, self._active) if a],
             maxiter=40,
+            tol=0.01,
+            updating="deferred",
+            polish=False,  # objective is piecewise-constant; L-BFGS-B polish is wasted
         )
-
-        self.params = result.x
+        if workers == 1:
+            result = differential_evolution(
+                self._objective_active, vectorized=True, **de_kwargs
+            )
+        else:
+            # scipy forbids vectorized together with workers; here each
+            # population member is shipped to a worker process instead
+            result = differential_evolution(
+                self._objective_active, workers=workers, **de_kwargs
+            )
+
+        self.params = self._expand_params(result.x)
         return self.params
 
 
@@ -130,7 +318,7 @@ if __name__ == "__main__":
     Beginner friendly.
     """
 
-    docs = retriever.invoke(query)
+    docs = retrieve(query)
     user_ings = [i.strip() for i in ingredients.split(",")]
 
     ranker = AutoRanker()
@@ -139,8 +327,9 @@ if __name__ == "__main__":
 
     ranker.params = np.load("ranker_weights.npy")
 
-    docs.sort(key=lambda d: ranker.score(d, user_ings, style_hint), reverse=True)
+    scores = ranker.score_docs(docs, user_ings, style_hint)
+    order = np.argsort(-scores)
 
     print("\n🏆 TOP 5 MENUS\n")
-    for d in docs[:5]:
-        print(d.metadata["menu"], d.metadata["views"])
+    for i in order[:5]:
+        print(docs[i].metadata["menu"], docs[i].metadata["views"])
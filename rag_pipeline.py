@@ -2,14 +2,25 @@
 from typing import List, Dict, Tuple
 import re
 
+import numpy as np
+
+from doc_table import DocTable, LEVEL_CODE, score_kernel, time_code_from_minutes
 from rag_llm import llm_chat, llm_chat_stream
-from retriever import retriever
+from retriever import retrieve
 
 # ---------------------------
 # Language detect
 # ---------------------------
+# 호출마다 re 캐시 조회하지 않게 모듈 레벨에서 한 번만 컴파일
+_KOREAN_RE = re.compile(r"[가-힣]")
+_SPLIT_RE = re.compile(r"[,/\\|\n]+")
+_TIME_RE = re.compile(r"(\d+)\s*분")
+
 def detect_language(text: str) -> str:
-    if re.search(r"[가-힣]", text):
+    if len(text) < 20:
+        # 아주 짧은 입력은 regex 기동보다 문자 루프가 빠름
+        return "Korean" if any("가" <= c <= "힣" for c in text) else "English"
+    if _KOREAN_RE.search(text):
         return "Korean"
     return "English"
 
@@ -41,7 +52,7 @@ def parse_ingredients(text: str) -> List[str]:
     if not text or text.strip() in ["없음", "none", "None"]:
         return []
     # 쉼표/줄바꿈/슬래시 등 대충 분리
-    items = re.split(r"[,/\\|\n]+", text)
+    items = _SPLIT_RE.split(text)
     return [i.strip() for i in items if i.strip()]
 
 def normalize_level(level: str) -> str:
@@ -59,7 +70,7 @@ def time_to_minutes(time_str: str) -> int:
     t = time_str.strip()
     if "정보" in t:
         return 9999
-    m = re.search(r"(\d+)\s*분", t)
+    m = _TIME_RE.search(t)
     if m:
         return int(m.group(1))
     return 9999
@@ -67,6 +78,13 @@ def time_to_minutes(time_str: str) -> int:
 # ---------------------------
 # Scoring (우선순위 엔진)
 # ---------------------------
+# level_code / time_code -> 점수
+_LEVEL_PTS = np.array([0.0, 5.0, 2.0])
+_TIME_PENALTY = np.array([0.0, 0.5, 1.5])
+
+# score_kernel용 가중치: [재료, 난이도, 인기도, 스타일, 시간페널티]
+_PIPE_W = np.array([3.0, 1.5, 1.0, 1.5, 1.0])
+
 def score_doc(doc, user_ings: List[str], style_hint: str) -> Tuple[float, Dict]:
     md = doc.metadata or {}
     text = doc.page_content or ""
@@ -81,36 +99,25 @@ def score_doc(doc, user_ings: List[str], style_hint: str) -> Tuple[float, Dict]:
         if ing and ing in text:
             ing_hit += 1
 
-    # 2) 난이도 점수 (초보 가정)
-    level_score = 0
-    if level in ["초급", "아무나", "쉬움", "Easy"]:
-        level_score = 5
-    elif level in ["중급"]:
-        level_score = 2
-    else:
-        level_score = 0
+    # 2) 난이도 점수 (초보 가정) - LUT 한 번으로 끝
+    level_score = float(_LEVEL_PTS[LEVEL_CODE.get(level, 0)])
 
     # 3) 조회수 점수 (log 느낌으로 완만하게)
     #   0~5 사이로 압축
     pop_score = min(5.0, views / 5000.0)  # 25k면 5점
 
     # 4) 스타일 힌트 (텍스트 포함 시 보너스)
-    style_score = 0
+    style = 0.0
     if style_hint and style_hint != "상관없음":
-        if style_hint in text or style_hint in str(md.get("situation", "")) or style_hint in str(md.get("method", "")):
-            style_score = 1.5
+        if style_hint in text or style_hint in (md.get("situation") or "") or style_hint in (md.get("method") or ""):
+            style = 1.0
 
     # 5) 조리시간 페널티 (너무 오래 걸리면 감점)
-    time_penalty = 0.0
-    if cook_time <= 30:
-        time_penalty = 0.0
-    elif cook_time <= 60:
-        time_penalty = 0.5
-    else:
-        time_penalty = 1.5
+    time_penalty = float(_TIME_PENALTY[time_code_from_minutes(cook_time)])
 
-    # 최종 점수: (재료가 있으면 강하게) + (쉬우면 강하게) + (인기도) + (스타일) - (시간)
-    final = (ing_hit * 3.0) + (level_score * 1.5) + (pop_score * 1.0) + style_score - time_penalty
+    # 최종 점수: AutoRanker와 같은 커널, 파이프라인 가중치만 다름
+    F = np.array([[ing_hit, level_score, pop_score, style, time_penalty]])
+    final = float(score_kernel(F, _PIPE_W)[0])
 
     debug = {
         "ing_hit": ing_hit,
@@ -121,6 +128,31 @@ def score_doc(doc, user_ings: List[str], style_hint: str) -> Tuple[float, Dict]:
     }
     return final, debug
 
+def score_table(table: DocTable, user_ings: List[str], style_hint: str) -> Tuple[np.ndarray, np.ndarray]:
+    """score_doc의 컬럼(SoA) 버전: 전체 테이블 점수를 한 번에 계산."""
+    n = len(table)
+    ing_hits = np.zeros(n, dtype=np.int32)
+    style = np.zeros(n)
+    use_style = bool(style_hint) and style_hint != "상관없음"
+
+    for i, text in enumerate(table.texts):
+        for ing in user_ings:
+            if ing and ing in text:
+                ing_hits[i] += 1
+        if use_style and (
+            style_hint in text
+            or style_hint in table.situations[i]
+            or style_hint in table.methods[i]
+        ):
+            style[i] = 1.0
+
+    level_score = _LEVEL_PTS[table.level_code]
+    pop_score = np.minimum(5.0, table.views / 5000.0)
+    time_penalty = _TIME_PENALTY[table.time_code]
+
+    F = np.column_stack([ing_hits, level_score, pop_score, style, time_penalty])
+    return score_kernel(F, _PIPE_W), ing_hits
+
 # ---------------------------
 # LLM title rewriting (선택)
 # ---------------------------
@@ -159,39 +191,48 @@ Find suitable Korean recipes.
 Beginner friendly.
 """.strip()
 
-    docs = retriever.invoke(query)  # Top-N 후보
+    docs = retrieve(query)  # Top-N 후보 (같은 query면 캐시 히트)
 
-    # 점수화 후 상위 5개
-    scored = []
-    for d in docs:
-        s, dbg = score_doc(d, user_ings, style_hint)
-        scored.append((s, d, dbg))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    top = scored[:5]
+    # 점수화 후 상위 5개 (doc별 dict 조회 대신 컬럼 단위로 계산)
+    table = DocTable.from_docs(docs)
+    scores, ing_hits = score_table(table, user_ings, style_hint)
+    # O(N) top-5 선택 후 5개만 정렬 (전체 sort 불필요)
+    if len(scores) > 5:
+        top_idx = np.argpartition(-scores, 5)[:5]
+    else:
+        top_idx = np.arange(len(scores))
+    top_idx = top_idx[np.argsort(-scores[top_idx])]
 
     language = detect_language(user_story)
     menus: List[Dict] = []
-    for s, d, dbg in top:
-        md = d.metadata or {}
-        raw_title = md.get("menu", "") or md.get("title", "") or "Unknown"
+    for i in top_idx:
+        # Document 경계는 DocTable에서 끝: 이후는 전부 컬럼/행 접근
+        row = table.row(i)
+        dbg = {
+            "ing_hit": int(ing_hits[i]),
+            "level": row.level,
+            "views": row.views,
+            "cook_time": row.cook_time,
+            "final": float(scores[i]),
+        }
+        raw_title = row.menu or row.title or "Unknown"
 
         # UI용 위트 제목
         display_title = make_witty_title(raw_title, user_story, language)
 
         # subtitle은 레시피제목(원문) 우선
-        subtitle = md.get("title", "")
-        level = md.get("level", "")
-        views = int(md.get("views", 0) or 0)
+        subtitle = row.title
+        level = row.level
+        views = row.views
 
         # 짧은 태그
         tags = []
         if level:
             tags.append(level)
-        if md.get("method"):
-            tags.append(md["method"])
-        if md.get("time") and "정보" not in str(md.get("time")):
-            tags.append(md["time"])
+        if row.method:
+            tags.append(row.method)
+        if table.times[i] and "정보" not in table.times[i]:
+            tags.append(table.times[i])
 
         # meme(한 줄) - 인기도/재료 매칭 기반
         if dbg["ing_hit"] >= 2:
@@ -225,7 +266,7 @@ def recipe_stream(user_story: str, ingredients: str, picked_menu_title: str):
     #  선택된 메뉴로 다시 검색해서 컨텍스트 확보 (정확도↑)
     #    (picked_menu_title이 raw_title일 때 가장 정확)
     query = f"요리명: {picked_menu_title}\nIngredients: {ingredients}\n"
-    docs = retriever.invoke(query)
+    docs = retrieve(query)
     context = "\n\n".join([d.page_content for d in docs[:3]])
 
     prompt = f"""
@@ -1,4 +1,6 @@
 # retriever.py
+from functools import lru_cache
+
 from langchain.vectorstores import Chroma
 from langchain.embeddings import HuggingFaceEmbeddings
 
@@ -14,3 +16,14 @@ vectorstore = Chroma(
 
 # ✅ 후보군 넉넉히 뽑고(예: 30), 아래에서 필터/정렬할 거임
 retriever = vectorstore.as_retriever(search_kwargs={"k": 30})
+
+
+@lru_cache(maxsize=256)
+def _cached_invoke(query: str):
+    # tuple이라야 캐시에 안전하게 들어감 (list는 호출부에서 sort로 변형함)
+    return tuple(retriever.invoke(query))
+
+
+def retrieve(query: str) -> list:
+    """같은 query면 임베딩 + 벡터 검색을 건너뛰는 캐시 버전."""
+    return list(_cached_invoke(query))